@@ -3,16 +3,26 @@ Authentication and authorization middleware for BigQuery API
 Handles Firebase Auth integration and multi-tenancy logic
 """
 
-import json
+import asyncio
+import hashlib
+import itertools
 import time
-from typing import Optional, Dict, Any, List
+from datetime import datetime
+from dataclasses import dataclass, field
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Optional, Dict, Any, Tuple, FrozenSet, Mapping, Iterator
+import orjson
+import redis.asyncio as redis
 import structlog
 from fastapi import Request, HTTPException
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.types import ASGIApp, Receive, Scope, Send
 from cachetools import TTLCache
+from jose import jwt, JWTError
 import firebase_admin
-from firebase_admin import credentials, auth as firebase_auth, firestore
+from firebase_admin import credentials, auth as firebase_auth
+from google.cloud import firestore
 
 from .config import get_settings
 from .exceptions import (
@@ -21,20 +31,60 @@ from .exceptions import (
     UserNotFoundError,
     CompanyNotFoundError,
     InvalidTokenError,
-    MissingTokenError,
-    ProjectAccessDeniedError
+    ProjectAccessDeniedError,
+    MISSING_TOKEN_ERROR,
+    INVALID_TOKEN_ERROR,
+    USER_NOT_FOUND_ERROR,
+    NOT_AUTHENTICATED_ERROR,
+    error_response
 )
 
 logger = structlog.get_logger()
 
-# Initialize Firebase Admin
 settings = get_settings()
 
-if not firebase_admin._apps:
+# Settings read on every user cache miss, snapshotted once at import.
+# Changing them requires a process restart.
+_SUPER_ADMIN_DOMAINS = settings.super_admin_domains_set
+_GCP_PROJECT_ID = settings.gcp_project_id
+_ACCESSIBLE_PROJECTS = tuple(settings.accessible_projects or [settings.gcp_project_id])
+
+# Cache for user data (5 minute TTL, max 1000 entries)
+user_cache = TTLCache(maxsize=1000, ttl=300)
+
+# Shared second-level user cache across workers, only when Redis is configured.
+# Short socket timeouts so a hung Redis falls back to Firestore instead of
+# blocking authentication.
+redis_client = redis.Redis.from_url(
+    settings.redis_url,
+    socket_timeout=0.5,
+    socket_connect_timeout=0.5
+) if settings.redis_url else None
+
+# Cache for verified token claims, keyed by token digest (1 minute TTL).
+# A revoked token may keep working until its entry expires.
+_token_cache = TTLCache(maxsize=5000, ttl=60)
+
+# Negative cache for users/companies missing from Firestore (1 minute TTL)
+_neg_user_cache = TTLCache(maxsize=10_000, ttl=60)
+
+# Only the fields get_user_info reads are fetched from Firestore
+_USER_FIELDS = ["company_id", "email_verified", "permissions"]
+_CLIENT_FIELDS = [
+    "gcpProjectId", "onboardingData.companyName", "status", "createdAt", "bigQueryDatasetId"
+]
+
+
+@lru_cache(maxsize=1)
+def _get_firebase_app() -> firebase_admin.App:
+    """Initialize Firebase Admin on first use instead of at import"""
+    if firebase_admin._apps:
+        return firebase_admin.get_app()
+    
     try:
         if settings.firebase_service_account_key:
             # Use service account key from environment
-            service_account_info = json.loads(settings.firebase_service_account_key)
+            service_account_info = orjson.loads(settings.firebase_service_account_key)
             cred = credentials.Certificate(service_account_info)
         elif settings.google_application_credentials:
             # Use service account file
@@ -43,59 +93,64 @@ if not firebase_admin._apps:
             # Use default credentials (ADC)
             cred = credentials.ApplicationDefault()
         
-        firebase_admin.initialize_app(cred, {
+        app = firebase_admin.initialize_app(cred, {
             'projectId': settings.firebase_project_id
         })
         logger.info("Firebase Admin initialized successfully")
+        return app
     except Exception as e:
         logger.error("Failed to initialize Firebase Admin", error=str(e))
         raise
 
-# Cache for user data (5 minute TTL, max 1000 entries)
-user_cache = TTLCache(maxsize=1000, ttl=300)
 
-# Firestore client
-db = firestore.client()
+@lru_cache(maxsize=1)
+def _get_firestore_client_cycle() -> Iterator[firestore.Client]:
+    """
+    Build the Firestore client pool on first use
+    Each client owns its own gRPC channel, so concurrent lookups are spread
+    round-robin instead of queueing on a single channel
+    """
+    firebase_credentials = _get_firebase_app().credential.get_credential()
+    client_pool = [
+        firestore.Client(project=settings.firebase_project_id, credentials=firebase_credentials)
+        for _ in range(settings.firestore_pool_size)
+    ]
+    return itertools.cycle(client_pool)
+
 
+def _get_firestore_client() -> firestore.Client:
+    """Get the next Firestore client from the pool"""
+    return next(_get_firestore_client_cycle())
 
+
+@dataclass(slots=True, frozen=True, eq=False)
 class UserInfo:
     """User information with multi-tenancy data"""
     
-    def __init__(
-        self,
-        uid: str,
-        email: str,
-        email_verified: bool,
-        company_id: str,
-        gcp_project_id: str,
-        company_name: str,
-        is_super_admin: bool = False,
-        accessible_projects: List[str] = None,
-        permissions: List[str] = None,
-        client_metadata: Dict[str, Any] = None
-    ):
-        self.uid = uid
-        self.email = email
-        self.email_verified = email_verified
-        self.company_id = company_id
-        self.gcp_project_id = gcp_project_id
-        self.company_name = company_name
-        self.is_super_admin = is_super_admin
-        self.accessible_projects = accessible_projects or [gcp_project_id]
-        self.permissions = permissions or ["read"]
-        self.client_metadata = client_metadata or {}
-    
-    def can_access_project(self, project_id: str) -> bool:
-        """Check if user can access a specific project"""
-        return self.is_super_admin or project_id in self.accessible_projects
-    
-    def has_permission(self, permission: str) -> bool:
-        """Check if user has a specific permission"""
-        return self.is_super_admin or permission in self.permissions
+    uid: str
+    email: str
+    email_verified: bool
+    company_id: str
+    gcp_project_id: str
+    company_name: str
+    is_super_admin: bool = False
+    accessible_projects: Optional[Tuple[str, ...]] = None
+    permissions: Optional[Tuple[str, ...]] = None
+    client_metadata: Optional[Dict[str, Any]] = None
+    _accessible_projects_set: FrozenSet[str] = field(init=False, repr=False)
+    _permissions_set: FrozenSet[str] = field(init=False, repr=False)
+    _dict: Mapping[str, Any] = field(init=False, repr=False)
     
-    def to_dict(self) -> Dict[str, Any]:
-        """Convert to dictionary for logging/serialization"""
-        return {
+    def __post_init__(self):
+        # Frozen dataclass: derived fields are set once through object.__setattr__
+        accessible_projects = tuple(self.accessible_projects or (self.gcp_project_id,))
+        permissions = tuple(self.permissions or ("read",))
+        object.__setattr__(self, "accessible_projects", accessible_projects)
+        object.__setattr__(self, "permissions", permissions)
+        object.__setattr__(self, "client_metadata", self.client_metadata or {})
+        object.__setattr__(self, "_accessible_projects_set", frozenset(accessible_projects))
+        object.__setattr__(self, "_permissions_set", frozenset(permissions))
+        object.__setattr__(self, "_dict", MappingProxyType({
             "uid": self.uid,
             "email": self.email,
             "email_verified": self.email_verified,
@@ -103,47 +158,151 @@ class UserInfo:
             "gcp_project_id": self.gcp_project_id,
             "company_name": self.company_name,
             "is_super_admin": self.is_super_admin,
-            "accessible_projects": self.accessible_projects,
-            "permissions": self.permissions
-        }
+            "accessible_projects": accessible_projects,
+            "permissions": permissions
+        }))
+    
+    def can_access_project(self, project_id: str) -> bool:
+        """Check if user can access a specific project"""
+        return self.is_super_admin or project_id in self._accessible_projects_set
+    
+    def has_permission(self, permission: str) -> bool:
+        """Check if user has a specific permission"""
+        return self.is_super_admin or permission in self._permissions_set
+    
+    def to_dict(self) -> Mapping[str, Any]:
+        """Read-only dictionary view for logging/serialization (built once)"""
+        return self._dict
+
+
+def _is_token_expired(token: str) -> bool:
+    """Cheap expiry check on the unverified token payload"""
+    try:
+        exp = jwt.get_unverified_claims(token).get("exp")
+    except JWTError:
+        # Malformed tokens are rejected by full verification
+        return False
+    return isinstance(exp, (int, float)) and exp <= time.time()
 
 
 async def validate_firebase_token(token: str) -> Dict[str, Any]:
     """Validate Firebase ID token"""
+    # Reuse claims of recently verified tokens; raw tokens are never kept
+    token_key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+    cached_claims = _token_cache.get(token_key)
+    if cached_claims is not None:
+        if cached_claims["exp"] > time.time():
+            return cached_claims
+        raise INVALID_TOKEN_ERROR.with_traceback(None)
+    
+    # Reject expired tokens before paying for signature verification
+    if _is_token_expired(token):
+        raise INVALID_TOKEN_ERROR.with_traceback(None)
+    
     try:
-        decoded_token = firebase_auth.verify_id_token(token, check_revoked=True)
-        return {
+        decoded_token = await asyncio.to_thread(
+            firebase_auth.verify_id_token, token, app=_get_firebase_app(), check_revoked=True
+        )
+        claims = {
             "uid": decoded_token["uid"],
             "email": decoded_token.get("email"),
             "email_verified": decoded_token.get("email_verified", False),
             "exp": decoded_token.get("exp"),
             "iat": decoded_token.get("iat")
         }
+        _token_cache[token_key] = claims
+        return claims
+    # Fresh instances here: inside an except block the raised error keeps
+    # the Firebase error (and its frames holding the token) as __context__
     except firebase_auth.InvalidIdTokenError:
-        raise InvalidTokenError()
+        raise InvalidTokenError() from None
     except firebase_auth.ExpiredIdTokenError:
-        raise InvalidTokenError()
+        raise InvalidTokenError() from None
     except firebase_auth.RevokedIdTokenError:
-        raise InvalidTokenError()
+        raise InvalidTokenError() from None
     except Exception as e:
+        # Details stay in the logs; clients only get a fixed message
         logger.error("Token validation error", error=str(e))
-        raise AuthenticationError(f"Token validation failed: {str(e)}")
+        raise AuthenticationError("Token validation failed")
+
+
+def _redis_user_key(uid: str) -> str:
+    """Redis key holding the serialized UserInfo for a user"""
+    return f"user:{uid}"
+
+
+async def _get_redis_user(uid: str) -> Optional[UserInfo]:
+    """Read a user from the Redis cache, ignoring Redis failures"""
+    try:
+        data = await redis_client.get(_redis_user_key(uid))
+    except redis.RedisError as e:
+        logger.warning("Redis user cache read failed", uid=uid, error=str(e))
+        return None
+    if data is None:
+        return None
+    
+    try:
+        user_data = orjson.loads(data)
+        client_metadata = user_data.get("client_metadata") or {}
+        if isinstance(client_metadata.get("created_at"), str):
+            # Serialized as a string; restore the datetime Firestore returns
+            client_metadata["created_at"] = datetime.fromisoformat(client_metadata["created_at"])
+        return UserInfo(**user_data)
+    except (orjson.JSONDecodeError, TypeError, ValueError, AttributeError) as e:
+        # Corrupt or stale-schema entry (e.g. UserInfo fields changed): treat
+        # it as a miss and drop it so Firestore repopulates it
+        logger.warning("Discarding invalid Redis user cache entry", uid=uid, error=str(e))
+        await _delete_redis_user(uid)
+        return None
+
+
+async def _set_redis_user(user_info: UserInfo):
+    """Write a user to the Redis cache, ignoring Redis failures"""
+    data = orjson.dumps(
+        {**user_info.to_dict(), "client_metadata": user_info.client_metadata},
+        default=str
+    )
+    try:
+        await redis_client.setex(_redis_user_key(user_info.uid), settings.cache_ttl, data)
+    except redis.RedisError as e:
+        logger.warning("Redis user cache write failed", uid=user_info.uid, error=str(e))
+
+
+async def _delete_redis_user(uid: str):
+    """Remove a user from the Redis cache, ignoring Redis failures"""
+    try:
+        await redis_client.delete(_redis_user_key(uid))
+    except redis.RedisError as e:
+        logger.warning("Redis user cache delete failed", uid=uid, error=str(e))
 
 
 async def get_user_info(uid: str, email: str) -> UserInfo:
     """Get user information with multi-tenancy data"""
     cache_key = f"user_{uid}"
     
-    # Check cache first
-    if cache_key in user_cache:
-        return user_cache[cache_key]
+    # Check cache first (single lookup; TTLCache expires entries on access)
+    cached_user = user_cache.get(cache_key)
+    if cached_user is not None:
+        return cached_user
+    
+    # Re-raise recent lookup failures without hitting Firestore again
+    cached_error = _neg_user_cache.get(uid)
+    if cached_error is not None:
+        raise cached_error()
+    
+    # Then the cache shared by all workers
+    if redis_client is not None:
+        cached_user = await _get_redis_user(uid)
+        if cached_user is not None:
+            user_cache[cache_key] = cached_user
+            return cached_user
     
     try:
         # Check if user is super admin
         is_super_admin = False
         if email:
-            email_domain = email.split("@")[-1] if "@" in email else ""
-            is_super_admin = email_domain in settings.super_admin_domains
+            _, at, email_domain = email.rpartition("@")
+            is_super_admin = bool(at) and email_domain in _SUPER_ADMIN_DOMAINS
         
         if is_super_admin:
             user_info = UserInfo(
@@ -151,18 +310,22 @@ async def get_user_info(uid: str, email: str) -> UserInfo:
                 email=email,
                 email_verified=True,  # Assume verified for super admins
                 company_id="super-admin",
-                gcp_project_id=settings.gcp_project_id,
+                gcp_project_id=_GCP_PROJECT_ID,
                 company_name="Be-Luma Admin",
                 is_super_admin=True,
-                accessible_projects=settings.accessible_projects or [settings.gcp_project_id],
+                accessible_projects=_ACCESSIBLE_PROJECTS,
                 permissions=["read", "write", "admin"]
             )
         else:
+            db = _get_firestore_client()
+            
             # Get user document from Firestore
-            user_doc = db.collection("users").document(uid).get()
+            user_doc = await asyncio.to_thread(
+                db.collection("users").document(uid).get, field_paths=_USER_FIELDS
+            )
             
             if not user_doc.exists:
-                raise UserNotFoundError()
+                raise USER_NOT_FOUND_ERROR.with_traceback(None)
             
             user_data = user_doc.to_dict()
             company_id = user_data.get("company_id")
@@ -171,7 +334,9 @@ async def get_user_info(uid: str, email: str) -> UserInfo:
                 raise AuthorizationError("User not associated with any company")
             
             # Get client document
-            client_doc = db.collection("clients").document(company_id).get()
+            client_doc = await asyncio.to_thread(
+                db.collection("clients").document(company_id).get, field_paths=_CLIENT_FIELDS
+            )
             
             if not client_doc.exists:
                 raise CompanyNotFoundError()
@@ -201,94 +366,123 @@ async def get_user_info(uid: str, email: str) -> UserInfo:
         
         # Cache the result
         user_cache[cache_key] = user_info
+        if redis_client is not None:
+            await _set_redis_user(user_info)
         return user_info
         
-    except (UserNotFoundError, CompanyNotFoundError, AuthorizationError):
+    except (UserNotFoundError, CompanyNotFoundError) as e:
+        _neg_user_cache[uid] = type(e)
+        raise
+    except AuthorizationError:
         raise
     except Exception as e:
         logger.error("Error getting user info", uid=uid, error=str(e))
-        raise AuthenticationError(f"Failed to get user information: {str(e)}")
+        raise AuthenticationError("Authentication service unavailable")
 
 
-class AuthMiddleware(BaseHTTPMiddleware):
-    """Authentication middleware for FastAPI"""
+class AuthMiddleware:
+    """Authentication middleware for FastAPI (pure ASGI)"""
     
-    def __init__(self, app):
-        super().__init__(app)
-        self.public_paths = {
-            "/health", "/health/", "/health/live", "/health/ready",
-            "/metrics", "/", "/docs", "/redoc", "/openapi.json"
-        }
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        # Exact public paths are checked with a set lookup; prefixes are
+        # matched in a single str.startswith call with a tuple argument
+        self._public_exact = frozenset({"/", "/health", "/metrics", "/openapi.json"})
+        self._public_prefixes = ("/health/", "/docs", "/redoc")
     
-    async def dispatch(self, request: Request, call_next):
-        # Skip authentication for public paths
-        if any(request.url.path.startswith(path) for path in self.public_paths):
-            return await call_next(request)
+    def _is_public_path(self, path: str) -> bool:
+        """Check if a path is exempt from authentication"""
+        return path in self._public_exact or path.startswith(self._public_prefixes)
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        path = scope["path"]
+        
+        # Default so route dependencies can read request.state.user directly
+        state = scope.setdefault("state", {})
+        state["user"] = None
+        
+        # Skip authentication for public paths and CORS preflight requests
+        if self._is_public_path(path) or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
         
         try:
-            # Extract token from Authorization header
-            auth_header = request.headers.get("authorization")
-            
-            if not auth_header or not auth_header.startswith("Bearer "):
-                raise MissingTokenError()
-            
-            token = auth_header[7:]  # Remove "Bearer " prefix
-            
-            if not token:
-                raise MissingTokenError()
-            
-            # Validate Firebase token
-            firebase_user = await validate_firebase_token(token)
-            
-            # Check token expiration
-            now = int(time.time())
-            if firebase_user["exp"] <= now:
-                raise InvalidTokenError()
-            
-            # Get user information with multi-tenancy data
-            user_info = await get_user_info(firebase_user["uid"], firebase_user["email"])
-            
-            # Attach user info to request state
-            request.state.user = user_info
-            
-            # Log successful authentication
-            logger.info(
-                "User authenticated successfully",
-                user_id=user_info.uid,
-                email=user_info.email,
-                company_id=user_info.company_id,
-                is_super_admin=user_info.is_super_admin,
-                gcp_project_id=user_info.gcp_project_id
-            )
-            
-            return await call_next(request)
-            
+            user_info = await self._authenticate(scope)
         except (AuthenticationError, AuthorizationError) as e:
+            client = scope.get("client")
             logger.warning(
                 "Authentication failed",
                 error=str(e),
-                path=request.url.path,
-                method=request.method,
-                client_ip=request.client.host if request.client else "unknown"
+                path=path,
+                method=scope["method"],
+                client_ip=client[0] if client else "unknown"
             )
-            raise e
+            response = error_response(e)
+            # Shared error instances outlive the request: drop the frames
+            # (including the raw token) their traceback and context reference
+            e.__traceback__ = None
+            e.__context__ = None
+            await response(scope, receive, send)
+            return
         except Exception as e:
             logger.error(
                 "Authentication middleware error",
                 error=str(e),
-                path=request.url.path,
-                method=request.method,
+                path=path,
+                method=scope["method"],
                 exc_info=True
             )
-            raise AuthenticationError("Authentication service unavailable")
+            error = AuthenticationError("Authentication service unavailable")
+            await error_response(error)(scope, receive, send)
+            return
+        
+        # Attach user info to request state
+        state["user"] = user_info
+        
+        # Log successful authentication
+        logger.info("User authenticated successfully", **user_info.to_dict())
+        
+        await self.app(scope, receive, send)
+    
+    async def _authenticate(self, scope: Scope) -> UserInfo:
+        """Resolve the user for a request from its Bearer token"""
+        # ASGI header names are lowercase bytes
+        auth_header = next(
+            (value for name, value in scope["headers"] if name == b"authorization"),
+            None
+        )
+        
+        if not auth_header or not auth_header.startswith(b"Bearer "):
+            raise MISSING_TOKEN_ERROR.with_traceback(None)
+        
+        token = auth_header[7:].decode("latin-1")  # Remove "Bearer " prefix
+        
+        if not token:
+            raise MISSING_TOKEN_ERROR.with_traceback(None)
+        
+        # Validate Firebase token
+        firebase_user = await validate_firebase_token(token)
+        
+        # Check token expiration
+        now = int(time.time())
+        if firebase_user["exp"] <= now:
+            raise INVALID_TOKEN_ERROR.with_traceback(None)
+        
+        # Get user information with multi-tenancy data
+        return await get_user_info(firebase_user["uid"], firebase_user["email"])
 
 
 # Dependency functions for route handlers
 async def get_current_user(request: Request) -> UserInfo:
     """Dependency to get current authenticated user"""
-    if not hasattr(request.state, "user"):
-        raise AuthenticationError("User not authenticated")
-    return request.state.user
+    user = request.state.user
+    if user is None:
+        raise NOT_AUTHENTICATED_ERROR.with_traceback(None)
+    return user
 
 
 async def get_current_super_admin(request: Request) -> UserInfo:
@@ -320,16 +514,19 @@ def require_project_access(project_id: str):
 
 
 # Utility functions
-def clear_user_cache(uid: str):
+async def clear_user_cache(uid: str):
     """Clear user cache for specific user"""
-    cache_key = f"user_{uid}"
-    if cache_key in user_cache:
-        del user_cache[cache_key]
+    user_cache.pop(f"user_{uid}", None)
+    _neg_user_cache.pop(uid, None)
+    if redis_client is not None:
+        await _delete_redis_user(uid)
 
 
 def clear_all_cache():
     """Clear all user cache"""
     user_cache.clear()
+    _neg_user_cache.clear()
+    _token_cache.clear()
 
 
 def get_cache_stats() -> Dict[str, Any]:
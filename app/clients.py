@@ -0,0 +1,30 @@
+"""
+Shared Google Cloud clients
+Each client is created once per process and project, then reused by routers
+and health checks instead of being rebuilt per request
+"""
+
+from functools import lru_cache
+from typing import Optional
+
+from google.cloud import bigquery
+from google.cloud import bigquery_storage
+from google.cloud import firestore
+
+
+@lru_cache(maxsize=None)
+def get_bq_client(project: Optional[str] = None) -> bigquery.Client:
+    """Get the cached BigQuery client for a project"""
+    return bigquery.Client(project=project)
+
+
+@lru_cache(maxsize=None)
+def get_bqstorage_client() -> bigquery_storage.BigQueryReadClient:
+    """Get the cached BigQuery Storage read client (Arrow result downloads)"""
+    return bigquery_storage.BigQueryReadClient()
+
+
+@lru_cache(maxsize=None)
+def get_firestore_client(project: Optional[str] = None) -> firestore.Client:
+    """Get the cached Firestore client for a project"""
+    return firestore.Client(project=project)
@@ -5,10 +5,51 @@ Using Pydantic Settings for type validation and environment variable management
 
 import os
 from typing import List, Optional
-from functools import lru_cache
+from functools import cached_property, lru_cache
 
-from pydantic import Field, validator
-from pydantic_settings import BaseSettings
+from pydantic import AliasChoices, Field, field_validator
+from pydantic_settings import (
+    BaseSettings,
+    DotEnvSettingsSource,
+    EnvSettingsSource,
+    PydanticBaseSettingsSource,
+    SettingsConfigDict
+)
+
+# List settings that may be given as comma-separated strings
+_CSV_LIST_FIELDS = frozenset({'allowed_origins', 'accessible_projects', 'super_admin_domains'})
+
+
+def _split_csv(v):
+    """Split a comma-separated string into a list of stripped, non-empty items"""
+    if isinstance(v, str):
+        return [item.strip() for item in v.split(',') if item.strip()]
+    return v
+
+
+class _CsvListsMixin:
+    """
+    Accept comma-separated values for list settings in env/.env sources
+    pydantic-settings JSON-decodes list fields before any validator runs, so
+    plain CSV must be split here; JSON arrays are still decoded as before
+    """
+    
+    def prepare_field_value(self, field_name, field, value, value_is_complex):
+        if (
+            field_name in _CSV_LIST_FIELDS
+            and isinstance(value, str)
+            and not value.lstrip().startswith('[')
+        ):
+            return _split_csv(value)
+        return super().prepare_field_value(field_name, field, value, value_is_complex)
+
+
+class _CsvEnvSettingsSource(_CsvListsMixin, EnvSettingsSource):
+    """Environment variables source with CSV list support"""
+
+
+class _CsvDotEnvSettingsSource(_CsvListsMixin, DotEnvSettingsSource):
+    """.env file source with CSV list support"""
 
 
 class Settings(BaseSettings):
@@ -18,9 +59,19 @@ class Settings(BaseSettings):
     debug: bool = Field(default=False, description="Enable debug mode")
     environment: str = Field(default="production", description="Environment name")
     port: int = Field(default=8080, description="Server port")
+    workers: int = Field(default=1, ge=1, description="Number of uvicorn worker processes")
+    threadpool_max_workers: int = Field(
+        default=64,
+        ge=1,
+        description="Worker threads for blocking SDK calls offloaded from the event loop"
+    )
     
     # Google Cloud settings
-    gcp_project_id: str = Field(..., description="Default GCP project ID")
+    gcp_project_id: str = Field(
+        ...,
+        validation_alias=AliasChoices('GCP_PROJECT_ID', 'GOOGLE_CLOUD_PROJECT'),
+        description="Default GCP project ID"
+    )
     google_application_credentials: Optional[str] = Field(
         default=None, 
         description="Path to service account JSON file"
@@ -41,6 +92,7 @@ class Settings(BaseSettings):
         description="Allowed CORS origins"
     )
     firebase_project_id: str = Field(..., description="Firebase project ID")
+    firestore_pool_size: int = Field(default=4, ge=1, description="Number of pooled Firestore clients")
     
     # Multi-tenant settings
     accessible_projects: List[str] = Field(
@@ -53,12 +105,22 @@ class Settings(BaseSettings):
     )
     
     # Rate limiting
+    rate_limit_enabled: bool = Field(default=False, description="Enforce per-client rate limits")
     rate_limit_requests: int = Field(default=100, description="Requests per window")
     rate_limit_window: int = Field(default=900, description="Rate limit window in seconds")
+    trusted_proxy_hops: int = Field(
+        default=1,
+        ge=0,
+        description="Proxies in front of the service that append to X-Forwarded-For (Cloud Run: 1)"
+    )
     
     # Caching
     cache_ttl: int = Field(default=300, description="Cache TTL in seconds")
-    redis_url: Optional[str] = Field(default=None, description="Redis URL for caching")
+    redis_url: Optional[str] = Field(
+        default=None,
+        validation_alias=AliasChoices('REDIS_URL', 'CACHE_URL'),
+        description="Redis URL for caching"
+    )
     
     # Logging
     log_level: str = Field(default="INFO", description="Logging level")
@@ -66,7 +128,8 @@ class Settings(BaseSettings):
     # Monitoring
     enable_metrics: bool = Field(default=True, description="Enable Prometheus metrics")
     
-    @validator('environment')
+    @field_validator('environment')
+    @classmethod
     def validate_environment(cls, v):
         """Validate environment value"""
         valid_envs = ['development', 'staging', 'production']
@@ -74,7 +137,8 @@ class Settings(BaseSettings):
             raise ValueError(f'Environment must be one of {valid_envs}')
         return v
     
-    @validator('log_level')
+    @field_validator('log_level')
+    @classmethod
     def validate_log_level(cls, v):
         """Validate log level"""
         valid_levels = ['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL']
@@ -82,26 +146,15 @@ class Settings(BaseSettings):
             raise ValueError(f'Log level must be one of {valid_levels}')
         return v.upper()
     
-    @validator('allowed_origins', pre=True)
-    def parse_allowed_origins(cls, v):
-        """Parse allowed origins from string if needed"""
-        if isinstance(v, str):
-            return [origin.strip() for origin in v.split(',') if origin.strip()]
-        return v
+    # Parse comma-separated lists (origins, projects, domains) from strings
+    parse_csv_lists = field_validator(
+        'allowed_origins', 'accessible_projects', 'super_admin_domains', mode='before'
+    )(_split_csv)
     
-    @validator('accessible_projects', pre=True)
-    def parse_accessible_projects(cls, v):
-        """Parse accessible projects from string if needed"""
-        if isinstance(v, str):
-            return [project.strip() for project in v.split(',') if project.strip()]
-        return v
-    
-    @validator('super_admin_domains', pre=True)
-    def parse_super_admin_domains(cls, v):
-        """Parse super admin domains from string if needed"""
-        if isinstance(v, str):
-            return [domain.strip() for domain in v.split(',') if domain.strip()]
-        return v
+    @cached_property
+    def super_admin_domains_set(self) -> frozenset:
+        """Super admin domains as a frozenset for O(1) membership checks"""
+        return frozenset(self.super_admin_domains)
     
     @property
     def is_development(self) -> bool:
@@ -113,24 +166,30 @@ class Settings(BaseSettings):
         """Check if running in production mode"""
         return self.environment == 'production' and not self.debug
     
-    class Config:
-        env_file = ".env"
-        env_file_encoding = "utf-8"
-        case_sensitive = False
-        
-        # Map environment variables to settings
-        fields = {
-            'gcp_project_id': {'env': ['GCP_PROJECT_ID', 'GOOGLE_CLOUD_PROJECT']},
-            'google_application_credentials': {'env': 'GOOGLE_APPLICATION_CREDENTIALS'},
-            'firebase_service_account_key': {'env': 'FIREBASE_SERVICE_ACCOUNT_KEY'},
-            'firebase_project_id': {'env': 'FIREBASE_PROJECT_ID'},
-            'bigquery_location': {'env': 'BIGQUERY_LOCATION'},
-            'allowed_origins': {'env': 'ALLOWED_ORIGINS'},
-            'accessible_projects': {'env': 'ACCESSIBLE_PROJECTS'},
-            'super_admin_domains': {'env': 'SUPER_ADMIN_DOMAINS'},
-            'redis_url': {'env': ['REDIS_URL', 'CACHE_URL']},
-            'log_level': {'env': 'LOG_LEVEL'},
-        }
+    @classmethod
+    def settings_customise_sources(
+        cls,
+        settings_cls: type[BaseSettings],
+        init_settings: PydanticBaseSettingsSource,
+        env_settings: PydanticBaseSettingsSource,
+        dotenv_settings: PydanticBaseSettingsSource,
+        file_secret_settings: PydanticBaseSettingsSource,
+    ) -> tuple[PydanticBaseSettingsSource, ...]:
+        """Use env sources that accept comma-separated lists"""
+        return (
+            init_settings,
+            _CsvEnvSettingsSource(settings_cls),
+            _CsvDotEnvSettingsSource(settings_cls),
+            file_secret_settings,
+        )
+    
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        env_file_encoding="utf-8",
+        case_sensitive=False,
+        # Aliased fields can still be passed by name
+        populate_by_name=True
+    )
 
 
 @lru_cache()
@@ -162,6 +221,8 @@ ENV_EXAMPLE = """
 DEBUG=false
 ENVIRONMENT=production
 PORT=8080
+WORKERS=1
+THREADPOOL_MAX_WORKERS=64
 
 # Google Cloud
 GCP_PROJECT_ID=gama-454419
@@ -171,6 +232,7 @@ FIREBASE_SERVICE_ACCOUNT_KEY={"type":"service_account",...}
 
 # Firebase
 FIREBASE_PROJECT_ID=be-luma-infra
+FIRESTORE_POOL_SIZE=4
 
 # BigQuery
 BIGQUERY_LOCATION=US
@@ -183,8 +245,10 @@ SUPER_ADMIN_DOMAINS=be-luma.com
 ACCESSIBLE_PROJECTS=gama-454419,other-project
 
 # Rate limiting
+RATE_LIMIT_ENABLED=false
 RATE_LIMIT_REQUESTS=100
 RATE_LIMIT_WINDOW=900
+TRUSTED_PROXY_HOPS=1
 
 # Caching
 CACHE_TTL=300
@@ -3,8 +3,11 @@ Custom exceptions for BigQuery API Service
 Provides specific error types for better error handling and logging
 """
 
+import re
+import time
 from typing import Optional, Dict, Any
 from fastapi import HTTPException
+from fastapi.responses import ORJSONResponse
 
 
 class BigQueryAPIException(HTTPException):
@@ -224,13 +227,36 @@ class QueryTooLargeError(BigQueryError):
         )
 
 
+# Shared instances of stateless errors raised on hot paths. Raise them with
+# .with_traceback(None) so tracebacks do not pile up across raises, never
+# from inside an except block, and clear __traceback__/__context__ once the
+# response is built (AuthMiddleware and the app's auth handler do this).
+MISSING_TOKEN_ERROR = MissingTokenError()
+INVALID_TOKEN_ERROR = InvalidTokenError()
+USER_NOT_FOUND_ERROR = UserNotFoundError()
+NOT_AUTHENTICATED_ERROR = AuthenticationError("User not authenticated")
+
+
+def error_response(exc: BigQueryAPIException) -> ORJSONResponse:
+    """Build the JSON error response for errors raised outside route handlers"""
+    return ORJSONResponse(
+        status_code=exc.status_code,
+        content={
+            "error": exc.detail,
+            "code": getattr(exc, "code", "BIGQUERY_ERROR"),
+            "timestamp": time.time()
+        },
+        headers=exc.headers
+    )
+
+
 # Error factories for common scenarios
 def create_auth_error(error_type: str, detail: str = "") -> AuthenticationError:
     """Create authentication error based on type"""
     error_map = {
-        "invalid_token": InvalidTokenError(),
-        "missing_token": MissingTokenError(),
-        "user_not_found": UserNotFoundError(),
+        "invalid_token": INVALID_TOKEN_ERROR,
+        "missing_token": MISSING_TOKEN_ERROR,
+        "user_not_found": USER_NOT_FOUND_ERROR,
     }
     
     if error_type in error_map:
@@ -239,15 +265,30 @@ def create_auth_error(error_type: str, detail: str = "") -> AuthenticationError:
     return AuthenticationError(detail=detail or f"Authentication error: {error_type}")
 
 
+# Keywords used to classify BigQuery error messages, matched in a single pass
+_BQ_ERROR_PATTERN = re.compile(r"timeout|too many|limit|syntax|invalid", re.IGNORECASE)
+_BQ_ERROR_CATEGORIES = {
+    "timeout": "timeout",
+    "too many": "size",
+    "limit": "size",
+    "syntax": "syntax",
+    "invalid": "syntax",
+}
+
+
 def create_bigquery_error(error_msg: str, error_code: str = "") -> BigQueryError:
     """Create BigQuery error from error message"""
+    categories = {
+        _BQ_ERROR_CATEGORIES[match.group(0).lower()]
+        for match in _BQ_ERROR_PATTERN.finditer(error_msg)
+    }
     
     # Map common BigQuery errors to appropriate status codes
-    if "timeout" in error_msg.lower():
+    if "timeout" in categories:
         return QueryTimeoutError(300)
-    elif "too many" in error_msg.lower() or "limit" in error_msg.lower():
+    elif "size" in categories:
         return QueryTooLargeError(10000)
-    elif "syntax" in error_msg.lower() or "invalid" in error_msg.lower():
+    elif "syntax" in categories:
         return InvalidQueryError(error_msg)
     else:
         return BigQueryError(
@@ -3,42 +3,59 @@ BigQuery API Service - Main Application
 Production-ready FastAPI service for multi-tenant BigQuery access
 """
 
+import asyncio
+import logging
 import os
+import secrets
 import time
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
+from functools import lru_cache
 from typing import Dict, Any
 
+import orjson
 import structlog
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
-from fastapi.responses import JSONResponse, Response
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
-from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
+from fastapi.responses import ORJSONResponse, Response
+from prometheus_client import (
+    CollectorRegistry,
+    Counter,
+    GCCollector,
+    Histogram,
+    PlatformCollector,
+    ProcessCollector,
+    generate_latest,
+    multiprocess,
+    CONTENT_TYPE_LATEST
+)
+from starlette.datastructures import URL, Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from .config import get_settings
 from .auth import AuthMiddleware
+from .rate_limit import TokenBucketLimiter, client_ip_from_scope
 from .routers import bigquery, health
 from .exceptions import BigQueryAPIException, AuthenticationError
 
 # Configure structured logging
+# orjson renders each event to bytes, which BytesLogger writes straight to
+# stdout; level filtering happens in the bound logger itself
 structlog.configure(
     processors=[
-        structlog.stdlib.filter_by_level,
-        structlog.stdlib.add_logger_name,
-        structlog.stdlib.add_log_level,
-        structlog.stdlib.PositionalArgumentsFormatter(),
+        structlog.processors.add_log_level,
         structlog.processors.TimeStamper(fmt="iso"),
         structlog.processors.StackInfoRenderer(),
         structlog.processors.format_exc_info,
         structlog.processors.UnicodeDecoder(),
-        structlog.processors.JSONRenderer()
+        structlog.processors.JSONRenderer(serializer=orjson.dumps)
     ],
     context_class=dict,
-    logger_factory=structlog.stdlib.LoggerFactory(),
-    wrapper_class=structlog.stdlib.BoundLogger,
+    logger_factory=structlog.BytesLoggerFactory(),
+    wrapper_class=structlog.make_filtering_bound_logger(
+        logging.getLevelName(get_settings().log_level)
+    ),
     cache_logger_on_first_use=True,
 )
 
@@ -52,11 +69,118 @@ REQUEST_COUNT = Counter(
 )
 REQUEST_LATENCY = Histogram(
     'http_request_duration_seconds', 
-    'HTTP request latency'
+    'HTTP request latency',
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
 )
 
-# Rate limiter
-limiter = Limiter(key_func=get_remote_address)
+
+def _render_metrics() -> bytes:
+    """
+    Render Prometheus metrics
+    With PROMETHEUS_MULTIPROC_DIR set, metrics of all worker processes are
+    aggregated from the shared directory instead of reporting only this one.
+    The process_*, python_gc_* and python_info series are not aggregated and
+    describe only the worker that serves the scrape.
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        ProcessCollector(registry=registry)
+        PlatformCollector(registry=registry)
+        GCCollector(registry=registry)
+        return generate_latest(registry)
+    return generate_latest()
+
+
+@lru_cache(maxsize=2048)
+def _request_counter(method: str, endpoint: str, status: int):
+    """Cached REQUEST_COUNT child for a label set (labels are bounded by route)"""
+    return REQUEST_COUNT.labels(method=method, endpoint=endpoint, status=status)
+
+
+def _endpoint_label(scope: Scope) -> str:
+    """Matched route template for metrics; unmatched paths share one label"""
+    return getattr(scope.get("route"), "path", "__other__")
+
+class LoggingMetricsMiddleware:
+    """Request logging and metrics middleware (pure ASGI)"""
+    
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.trusted_proxy_hops = get_settings().trusted_proxy_hops
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        start_time = time.perf_counter()
+        method = scope["method"]
+        path = scope["path"]
+        
+        # Generate request ID
+        request_id = f"req_{secrets.token_hex(8)}"
+        
+        # Log incoming request
+        logger.info(
+            "Incoming request",
+            method=method,
+            path=path,
+            client_ip=client_ip_from_scope(scope, self.trusted_proxy_hops),
+            user_agent=Headers(scope=scope).get("user-agent"),
+            request_id=request_id
+        )
+        
+        status_code = 500
+        error = None
+        
+        async def send_with_headers(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                
+                # Add response headers (raw ASGI header pairs)
+                elapsed_us = int((time.perf_counter() - start_time) * 1_000_000)
+                message["headers"] = [
+                    *message.get("headers", ()),
+                    (b"x-request-id", request_id.encode()),
+                    (b"x-response-time-us", str(elapsed_us).encode())
+                ]
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_with_headers)
+        except Exception as e:
+            status_code = 500
+            error = e
+            raise
+        finally:
+            # Calculate metrics once, for successful and failed requests alike
+            duration = time.perf_counter() - start_time
+            duration_us = int(duration * 1_000_000)
+            REQUEST_LATENCY.observe(duration)
+            _request_counter(method, _endpoint_label(scope), status_code).inc()
+            
+            if error is None:
+                logger.info(
+                    "Request completed",
+                    method=method,
+                    path=path,
+                    status_code=status_code,
+                    duration_us=duration_us,
+                    request_id=request_id
+                )
+            else:
+                logger.error(
+                    "Request failed",
+                    method=method,
+                    url=str(URL(scope=scope)),
+                    error=str(error),
+                    duration_us=duration_us,
+                    request_id=request_id,
+                    exc_info=error
+                )
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -64,6 +188,13 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info("🚀 Starting BigQuery API Service")
     
+    # Size the default executor used by asyncio.to_thread so concurrent
+    # Firebase/Firestore calls can overlap instead of queueing
+    settings = get_settings()
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=settings.threadpool_max_workers)
+    )
+    
     # Initialize any startup services here
     # e.g., database connections, caches, etc.
     
@@ -84,9 +215,29 @@ def create_app() -> FastAPI:
         docs_url="/docs" if settings.debug else None,
         redoc_url="/redoc" if settings.debug else None,
         openapi_url="/openapi.json" if settings.debug else None,
+        default_response_class=ORJSONResponse,
         lifespan=lifespan
     )
 
+    # Add gzip compression; level 1 keeps large query responses from
+    # blocking the event loop while still shrinking JSON well
+    app.add_middleware(GZipMiddleware, minimum_size=16384, compresslevel=1)
+
+    # Add custom authentication middleware
+    app.add_middleware(AuthMiddleware)
+
+    # Add rate limiting when enabled (before authentication, so rejected
+    # requests cost the least; inside CORS and logging so 429s get CORS
+    # headers and are logged and counted). The client IP comes from the
+    # X-Forwarded-For entries appended by the trusted proxies.
+    if settings.rate_limit_enabled:
+        app.add_middleware(
+            TokenBucketLimiter,
+            capacity=settings.rate_limit_requests,
+            window_seconds=settings.rate_limit_window,
+            trusted_hops=settings.trusted_proxy_hops
+        )
+
     # Configure CORS
     app.add_middleware(
         CORSMiddleware,
@@ -94,83 +245,11 @@ def create_app() -> FastAPI:
         allow_credentials=True,
         allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
         allow_headers=["*"],
-        expose_headers=["X-Request-ID", "X-RateLimit-Remaining"]
+        expose_headers=["X-Request-ID"]
     )
 
-    # Add gzip compression
-    app.add_middleware(GZipMiddleware, minimum_size=1000)
-
-    # Add rate limiting
-    app.state.limiter = limiter
-    app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
-
-    # Add custom authentication middleware
-    app.add_middleware(AuthMiddleware)
-
-    # Add request logging and metrics middleware
-    @app.middleware("http")
-    async def logging_and_metrics_middleware(request: Request, call_next):
-        start_time = time.time()
-        
-        # Generate request ID
-        request_id = f"req_{int(time.time())}_{hash(str(request.url))}"
-        
-        # Log incoming request
-        logger.info(
-            "Incoming request",
-            method=request.method,
-            url=str(request.url),
-            client_ip=get_remote_address(request),
-            user_agent=request.headers.get("user-agent"),
-            request_id=request_id
-        )
-        
-        try:
-            response = await call_next(request)
-            
-            # Calculate metrics
-            duration = time.time() - start_time
-            REQUEST_LATENCY.observe(duration)
-            REQUEST_COUNT.labels(
-                method=request.method,
-                endpoint=request.url.path,
-                status=response.status_code
-            ).inc()
-            
-            # Add response headers
-            response.headers["X-Request-ID"] = request_id
-            response.headers["X-Response-Time"] = f"{duration:.3f}s"
-            
-            # Log response
-            logger.info(
-                "Request completed",
-                method=request.method,
-                url=str(request.url),
-                status_code=response.status_code,
-                duration=duration,
-                request_id=request_id
-            )
-            
-            return response
-            
-        except Exception as e:
-            duration = time.time() - start_time
-            REQUEST_COUNT.labels(
-                method=request.method,
-                endpoint=request.url.path,
-                status=500
-            ).inc()
-            
-            logger.error(
-                "Request failed",
-                method=request.method,
-                url=str(request.url),
-                error=str(e),
-                duration=duration,
-                request_id=request_id,
-                exc_info=True
-            )
-            raise
+    # Add request logging and metrics middleware (outermost)
+    app.add_middleware(LoggingMetricsMiddleware)
 
     # Exception handlers
     @app.exception_handler(BigQueryAPIException)
@@ -181,7 +260,7 @@ def create_app() -> FastAPI:
             status_code=exc.status_code,
             url=str(request.url)
         )
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=exc.status_code,
             content={
                 "error": exc.detail,
@@ -196,9 +275,13 @@ def create_app() -> FastAPI:
             "Authentication error",
             error=exc.detail,
             url=str(request.url),
-            client_ip=get_remote_address(request)
+            client_ip=request.client.host if request.client else "127.0.0.1"
         )
-        return JSONResponse(
+        # May be a shared instance (e.g. NOT_AUTHENTICATED_ERROR); drop the
+        # request frames its traceback references
+        exc.__traceback__ = None
+        exc.__context__ = None
+        return ORJSONResponse(
             status_code=exc.status_code,
             content={
                 "error": exc.detail,
@@ -209,7 +292,7 @@ def create_app() -> FastAPI:
 
     @app.exception_handler(HTTPException)
     async def http_exception_handler(request: Request, exc: HTTPException):
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=exc.status_code,
             content={
                 "error": exc.detail,
@@ -225,7 +308,7 @@ def create_app() -> FastAPI:
             url=str(request.url),
             exc_info=True
         )
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=500,
             content={
                 "error": "Internal server error",
@@ -247,19 +330,24 @@ def create_app() -> FastAPI:
     @app.get("/metrics")
     async def metrics():
         """Prometheus metrics endpoint"""
-        return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+        # Serialization can be large; keep it off the event loop
+        data = await asyncio.to_thread(_render_metrics)
+        return Response(data, media_type=CONTENT_TYPE_LATEST)
 
-    # Root endpoint
+    # Root endpoint; the static fields are serialized once, leaving the
+    # object open so only the timestamp is appended per request
+    root_body_prefix = orjson.dumps({
+        "service": "BigQuery API",
+        "version": "1.0.0",
+        "status": "healthy",
+        "docs": "/docs" if settings.debug else "disabled"
+    })[:-1]
+    
     @app.get("/")
     async def root():
         """Root endpoint with API information"""
-        return {
-            "service": "BigQuery API",
-            "version": "1.0.0",
-            "status": "healthy",
-            "docs": "/docs" if settings.debug else "disabled",
-            "timestamp": time.time()
-        }
+        now = repr(time.time()).encode()
+        return Response(root_body_prefix + b',"timestamp":' + now + b"}", media_type="application/json")
 
     return app
 
@@ -275,6 +363,9 @@ if __name__ == "__main__":
         host="0.0.0.0",
         port=settings.port,
         reload=settings.debug,
-        access_log=True,
+        workers=settings.workers,
+        loop="uvloop",
+        http="httptools",
+        access_log=False,  # Requests are already logged by LoggingMetricsMiddleware
         log_config=None  # Use structlog instead
     ) 
\ No newline at end of file
@@ -0,0 +1,105 @@
+"""
+Rate limiting middleware for BigQuery API
+Token bucket per client IP, kept in process memory for each worker
+"""
+
+import math
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from .exceptions import RateLimitError, error_response
+
+
+def client_ip_from_scope(scope: Scope, trusted_hops: int) -> str:
+    """
+    Client IP for a request behind trusted_hops proxies
+    Each trusted proxy appends the address it received the request from to
+    X-Forwarded-For, so the client is the trusted_hops-th entry from the
+    right. Entries further left are whatever the caller sent and are ignored.
+    With no trusted proxies (or too few entries) the peer address is used.
+    """
+    if trusted_hops > 0:
+        forwarded = b",".join(
+            value for name, value in scope["headers"] if name == b"x-forwarded-for"
+        )
+        hosts = [host.strip() for host in forwarded.decode("latin-1").split(",") if host.strip()]
+        if len(hosts) >= trusted_hops:
+            return hosts[-trusted_hops]
+    
+    client = scope.get("client")
+    return client[0] if client else "127.0.0.1"
+
+
+class TokenBucketLimiter:
+    """Per-client token bucket rate limiter (pure ASGI)"""
+    
+    def __init__(
+        self,
+        app: ASGIApp,
+        capacity: int,
+        window_seconds: int,
+        trusted_hops: int = 0,
+        max_buckets: int = 10_000,
+        exempt_prefixes: Tuple[str, ...] = ("/health", "/metrics"),
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.app = app
+        self.capacity = float(capacity)
+        self.window_seconds = window_seconds
+        self.rate = capacity / window_seconds  # Tokens refilled per second
+        self.trusted_hops = trusted_hops
+        self.max_buckets = max_buckets
+        self.exempt_prefixes = exempt_prefixes
+        self.clock = clock
+        # Client IP -> (tokens, last refill time), least recently seen first.
+        # The event loop is single threaded, so read-modify-write of an entry
+        # needs no lock.
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._next_prune = clock() + window_seconds
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"].startswith(self.exempt_prefixes):
+            await self.app(scope, receive, send)
+            return
+        
+        retry_after = self._take(client_ip_from_scope(scope, self.trusted_hops), self.clock())
+        if retry_after is not None:
+            error = RateLimitError(headers={"Retry-After": str(retry_after)})
+            await error_response(error)(scope, receive, send)
+            return
+        
+        await self.app(scope, receive, send)
+    
+    def _take(self, key: str, now: float) -> Optional[int]:
+        """Take a token for a client; returns Retry-After seconds when empty"""
+        if now >= self._next_prune:
+            self._prune(now)
+        
+        # Pop and re-insert so the dict stays ordered by last use
+        bucket = self._buckets.pop(key, None)
+        if bucket is None:
+            tokens = self.capacity
+            if len(self._buckets) >= self.max_buckets:
+                # Hard cap: evict the least recently seen client
+                del self._buckets[next(iter(self._buckets))]
+        else:
+            tokens, last_refill = bucket
+            tokens = min(self.capacity, tokens + (now - last_refill) * self.rate)
+        
+        if tokens < 1:
+            self._buckets[key] = (tokens, now)
+            return math.ceil((1 - tokens) / self.rate)
+        
+        self._buckets[key] = (tokens - 1, now)
+        return None
+    
+    def _prune(self, now: float):
+        """Drop buckets that have refilled completely (same as an unseen client)"""
+        self._buckets = {
+            key: (tokens, last_refill)
+            for key, (tokens, last_refill) in self._buckets.items()
+            if tokens + (now - last_refill) * self.rate < self.capacity
+        }
+        self._next_prune = now + self.window_seconds
@@ -3,15 +3,23 @@ BigQuery Router - Main API endpoints for BigQuery operations
 Handles data queries, table management, and analytics operations
 """
 
+import asyncio
+import base64
+import re
 import time
-from typing import Dict, Any, List, Optional
+from decimal import Decimal
+from typing import Dict, Any, List, Optional, Tuple
+import orjson
 import structlog
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel, Field, validator
+from google.api_core import page_iterator
 from google.cloud import bigquery
 from google.cloud.exceptions import NotFound, BadRequest, Forbidden
 
 from ..auth import get_current_user, require_permission, UserInfo
+from ..clients import get_bq_client, get_bqstorage_client
 from ..config import get_settings
 from ..exceptions import (
     BigQueryAPIException,
@@ -24,8 +32,19 @@ logger = structlog.get_logger()
 router = APIRouter()
 settings = get_settings()
 
-# Initialize BigQuery client
-bq_client = bigquery.Client()
+# Statements not allowed in user queries (whole words, any case)
+_FORBIDDEN_KEYWORDS = re.compile(
+    r"\b(?:DROP|DELETE|TRUNCATE|ALTER|CREATE|INSERT|UPDATE)\b",
+    re.IGNORECASE
+)
+
+
+# Concurrent get_table calls across list_tables requests. Keeps the fan-out
+# within the BigQuery client's HTTP connection pool (~10) and leaves the
+# shared default executor free for auth lookups.
+_TABLE_FETCH_CONCURRENCY = 8
+_table_fetch_semaphore = asyncio.Semaphore(_TABLE_FETCH_CONCURRENCY)
+
 
 # Request/Response Models
 class QueryRequest(BaseModel):
@@ -44,12 +63,9 @@ class QueryRequest(BaseModel):
             raise ValueError("Query cannot be empty")
         
         # Basic security checks
-        dangerous_keywords = ['DROP', 'DELETE', 'TRUNCATE', 'ALTER', 'CREATE', 'INSERT', 'UPDATE']
-        query_upper = v.upper()
-        
-        for keyword in dangerous_keywords:
-            if keyword in query_upper:
-                raise ValueError(f"Query contains forbidden keyword: {keyword}")
+        match = _FORBIDDEN_KEYWORDS.search(v)
+        if match:
+            raise ValueError(f"Query contains forbidden keyword: {match.group(0).upper()}")
         
         return v.strip()
 
@@ -77,8 +93,36 @@ class QueryResponse(BaseModel):
     cache_hit: Optional[bool] = None
 
 
+def _json_default(obj: Any) -> Any:
+    """Encode BigQuery values orjson does not handle natively"""
+    if isinstance(obj, Decimal):
+        # NUMERIC/BIGNUMERIC as plain strings to keep full precision. Arrow
+        # pads to the column scale (1.1 -> 1.100000000), so trailing zeros
+        # are dropped to match the values the REST API returns.
+        text = format(obj, "f")
+        if "." in text:
+            text = text.rstrip("0").rstrip(".")
+        return text
+    if isinstance(obj, bytes):
+        # BYTES as base64, matching the BigQuery REST API
+        return base64.b64encode(obj).decode("ascii")
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+class QueryJSONResponse(ORJSONResponse):
+    """ORJSONResponse that also encodes NUMERIC and BYTES query values"""
+    
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(
+            content,
+            default=_json_default,
+            # UTC timestamps as "...Z", as the pydantic serializer wrote them
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z
+        )
+
+
 # Query execution endpoint
-@router.post("/query", response_model=QueryResponse)
+@router.post("/query", response_model=QueryResponse, response_class=QueryJSONResponse)
 async def execute_query(
     request: QueryRequest,
     user: UserInfo = Depends(require_permission("read"))
@@ -93,6 +137,8 @@ async def execute_query(
     if not user.can_access_project(target_project):
         raise ProjectAccessDeniedError(target_project)
     
+    bq_client = get_bq_client(settings.gcp_project_id)
+    
     try:
         # Configure query job
         job_config = bigquery.QueryJobConfig(
@@ -120,23 +166,21 @@ async def execute_query(
         )
         
         if request.dry_run:
-            return QueryResponse(
-                success=True,
-                data=[],
-                total_rows=0,
-                bytes_processed=query_job.total_bytes_processed,
-                execution_time=time.time() - start_time,
-                query_id=query_job.job_id
-            )
+            return QueryJSONResponse({
+                "success": True,
+                "data": [],
+                "total_rows": 0,
+                "bytes_processed": query_job.total_bytes_processed,
+                "execution_time": time.time() - start_time,
+                "query_id": query_job.job_id,
+                "cache_hit": None
+            })
         
         # Wait for query completion with timeout
         timeout = request.timeout or settings.bigquery_job_timeout
-        results = query_job.result(timeout=timeout, max_results=request.max_results)
-        
-        # Convert results to list of dictionaries
-        data = []
-        for row in results:
-            data.append(dict(row))
+        results, data = await asyncio.to_thread(
+            _wait_and_download, query_job, timeout, request.max_results
+        )
         
         execution_time = time.time() - start_time
         
@@ -149,15 +193,16 @@ async def execute_query(
             bytes_processed=query_job.total_bytes_processed
         )
         
-        return QueryResponse(
-            success=True,
-            data=data,
-            total_rows=results.total_rows or len(data),
-            bytes_processed=query_job.total_bytes_processed,
-            execution_time=execution_time,
-            query_id=query_job.job_id,
-            cache_hit=query_job.cache_hit
-        )
+        # Rows go straight to orjson; response_model only documents the shape
+        return QueryJSONResponse({
+            "success": True,
+            "data": data,
+            "total_rows": results.total_rows or len(data),
+            "bytes_processed": query_job.total_bytes_processed,
+            "execution_time": execution_time,
+            "query_id": query_job.job_id,
+            "cache_hit": query_job.cache_hit
+        })
         
     except BadRequest as e:
         logger.error("Invalid BigQuery query", error=str(e), user_id=user.uid)
@@ -178,10 +223,53 @@ async def execute_query(
         raise BigQueryAPIException(f"Query execution failed: {str(e)}")
 
 
+def _download_rows(results: bigquery.table.RowIterator) -> List[Dict[str, Any]]:
+    """
+    Download query rows as dictionaries (blocking)
+    Rows are read as Arrow through the BigQuery Storage API when possible and
+    converted in one columnar pass. The Storage API needs
+    bigquery.readsessions.create and the API enabled on the project; when
+    that is denied the rows are downloaded over the REST API instead.
+    """
+    try:
+        arrow_table = results.to_arrow(
+            bqstorage_client=get_bqstorage_client(),
+            create_bqstorage_client=False
+        )
+    except Forbidden as e:
+        logger.warning("BigQuery Storage API read denied, using REST download", error=str(e))
+        arrow_table = results.to_arrow(create_bqstorage_client=False)
+    return arrow_table.to_pylist()
+
+
+async def _get_table_limited(bq_client: bigquery.Client, table_ref: bigquery.TableReference) -> bigquery.Table:
+    """Fetch table metadata in a thread, bounded by the shared semaphore"""
+    async with _table_fetch_semaphore:
+        return await asyncio.to_thread(bq_client.get_table, table_ref)
+
+
+def _wait_and_download(
+    query_job: bigquery.QueryJob,
+    timeout: int,
+    max_results: Optional[int]
+) -> Tuple[bigquery.table.RowIterator, List[Dict[str, Any]]]:
+    """Wait for a query job and download its rows (blocking, run in a thread)"""
+    results = query_job.result(timeout=timeout, max_results=max_results)
+    return results, _download_rows(results)
+
+
+def _fetch_page(iterator: page_iterator.Iterator) -> Tuple[List[Any], Optional[str]]:
+    """Drain one bounded page of a list iterator (blocking, run in a thread)"""
+    items = list(iterator)
+    return items, iterator.next_page_token
+
+
 # List datasets endpoint
 @router.get("/datasets")
 async def list_datasets(
     project_id: Optional[str] = Query(None, description="Target project ID"),
+    page_size: int = Query(100, ge=1, le=500, description="Maximum datasets to return"),
+    page_token: Optional[str] = Query(None, description="Token from a previous page"),
     user: UserInfo = Depends(require_permission("read"))
 ):
     """List available datasets in the project"""
@@ -190,8 +278,18 @@ async def list_datasets(
     if not user.can_access_project(target_project):
         raise ProjectAccessDeniedError(target_project)
     
+    bq_client = get_bq_client(settings.gcp_project_id)
+    
     try:
-        datasets = list(bq_client.list_datasets(project=target_project))
+        datasets, next_page_token = await asyncio.to_thread(
+            _fetch_page,
+            bq_client.list_datasets(
+                project=target_project,
+                max_results=page_size,
+                page_size=page_size,
+                page_token=page_token
+            )
+        )
         
         dataset_list = []
         for dataset in datasets:
@@ -199,8 +297,8 @@ async def list_datasets(
                 "dataset_id": dataset.dataset_id,
                 "project_id": dataset.project,
                 "location": dataset.location,
-                "created": dataset.created.isoformat() if dataset.created else None,
-                "modified": dataset.modified.isoformat() if dataset.modified else None,
+                "created": dataset.created,
+                "modified": dataset.modified,
                 "description": dataset.description
             })
         
@@ -215,7 +313,8 @@ async def list_datasets(
             "success": True,
             "datasets": dataset_list,
             "project_id": target_project,
-            "count": len(dataset_list)
+            "count": len(dataset_list),
+            "next_page_token": next_page_token
         }
         
     except NotFound:
@@ -230,6 +329,8 @@ async def list_datasets(
 async def list_tables(
     dataset_id: str,
     project_id: Optional[str] = Query(None, description="Target project ID"),
+    page_size: int = Query(100, ge=1, le=500, description="Maximum tables to return"),
+    page_token: Optional[str] = Query(None, description="Token from a previous page"),
     user: UserInfo = Depends(require_permission("read"))
 ):
     """List tables in a specific dataset"""
@@ -238,16 +339,28 @@ async def list_tables(
     if not user.can_access_project(target_project):
         raise ProjectAccessDeniedError(target_project)
     
+    bq_client = get_bq_client(settings.gcp_project_id)
+    
     try:
         dataset_ref = bq_client.dataset(dataset_id, project=target_project)
-        tables = list(bq_client.list_tables(dataset_ref))
+        tables, next_page_token = await asyncio.to_thread(
+            _fetch_page,
+            bq_client.list_tables(
+                dataset_ref,
+                max_results=page_size,
+                page_size=page_size,
+                page_token=page_token
+            )
+        )
+        
+        # Get detailed table info concurrently, a bounded number at a time
+        table_objs = await asyncio.gather(*[
+            _get_table_limited(bq_client, dataset_ref.table(table.table_id))
+            for table in tables
+        ])
         
         table_list = []
-        for table in tables:
-            # Get detailed table info
-            table_ref = dataset_ref.table(table.table_id)
-            table_obj = bq_client.get_table(table_ref)
-            
+        for table, table_obj in zip(tables, table_objs):
             table_list.append({
                 "table_id": table.table_id,
                 "dataset_id": dataset_id,
@@ -255,8 +368,8 @@ async def list_tables(
                 "table_type": table.table_type,
                 "num_rows": table_obj.num_rows,
                 "num_bytes": table_obj.num_bytes,
-                "created": table_obj.created.isoformat() if table_obj.created else None,
-                "modified": table_obj.modified.isoformat() if table_obj.modified else None,
+                "created": table_obj.created,
+                "modified": table_obj.modified,
                 "description": table_obj.description,
                 "schema_fields": len(table_obj.schema) if table_obj.schema else 0
             })
@@ -274,7 +387,8 @@ async def list_tables(
             "tables": table_list,
             "dataset_id": dataset_id,
             "project_id": target_project,
-            "count": len(table_list)
+            "count": len(table_list),
+            "next_page_token": next_page_token
         }
         
     except NotFound:
@@ -301,6 +415,8 @@ async def get_table_schema(
     if not user.can_access_project(target_project):
         raise ProjectAccessDeniedError(target_project)
     
+    bq_client = get_bq_client(settings.gcp_project_id)
+    
     try:
         table_ref = bq_client.dataset(dataset_id, project=target_project).table(table_id)
         table = bq_client.get_table(table_ref)
@@ -322,8 +438,8 @@ async def get_table_schema(
             "schema": schema_fields,
             "num_rows": table.num_rows,
             "num_bytes": table.num_bytes,
-            "created": table.created.isoformat() if table.created else None,
-            "modified": table.modified.isoformat() if table.modified else None
+            "created": table.created,
+            "modified": table.modified
         }
         
     except NotFound:
@@ -351,23 +467,44 @@ async def preview_table_data(
     if not user.can_access_project(target_project):
         raise ProjectAccessDeniedError(target_project)
     
+    bq_client = get_bq_client(settings.gcp_project_id)
+    start_time = time.time()
+    
     try:
-        # Construct a simple SELECT query with LIMIT
-        query = f"""
-        SELECT *
-        FROM `{target_project}.{dataset_id}.{table_id}`
-        LIMIT {limit}
-        """
+        table_ref = bq_client.dataset(dataset_id, project=target_project).table(table_id)
+        table = await asyncio.to_thread(bq_client.get_table, table_ref)
         
-        # Execute query using our existing query function
-        request = QueryRequest(
-            query=query,
-            project_id=target_project,
-            max_results=limit
+        # tabledata.list only works on tables; views, materialized views and
+        # external tables are previewed with a LIMIT query as before
+        if table.table_type != "TABLE":
+            request = QueryRequest(
+                query=f"SELECT * FROM `{table.project}.{table.dataset_id}.{table.table_id}` LIMIT {limit}",
+                project_id=target_project,
+                max_results=limit
+            )
+            return await execute_query(request, user)
+        
+        # Read rows directly (tabledata.list): no query job, no bytes billed
+        rows = await asyncio.to_thread(
+            lambda: list(bq_client.list_rows(table, max_results=limit))
         )
+        data = [dict(row) for row in rows]
         
-        return await execute_query(request, user)
+        return QueryJSONResponse({
+            "success": True,
+            "data": data,
+            "total_rows": len(data),
+            "bytes_processed": 0,
+            "execution_time": time.time() - start_time,
+            "query_id": None,
+            "cache_hit": None
+        })
         
+    except NotFound:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Table {dataset_id}.{table_id} not found in project {target_project}"
+        )
     except Exception as e:
         logger.error("Failed to preview table data", error=str(e), user_id=user.uid)
         raise BigQueryAPIException(f"Failed to preview table data: {str(e)}") 
\ No newline at end of file
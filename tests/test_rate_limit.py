@@ -0,0 +1,139 @@
+"""
+Tests for the token bucket rate limiting middleware
+"""
+
+import pytest
+
+from app.rate_limit import TokenBucketLimiter, client_ip_from_scope
+
+
+class FakeClock:
+    """Controllable replacement for time.monotonic"""
+    
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+    
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+async def ok_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+def http_scope(path="/api/bigquery/datasets", client=("10.0.0.1", 1234), headers=()):
+    return {"type": "http", "method": "GET", "path": path, "client": client, "headers": list(headers)}
+
+
+async def call(limiter, scope):
+    """Run one request through the limiter; returns (status, headers)"""
+    messages = []
+    
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+    
+    async def send(message):
+        messages.append(message)
+    
+    await limiter(scope, receive, send)
+    start = messages[0]
+    return start["status"], dict(start["headers"])
+
+
+@pytest.mark.asyncio
+async def test_rejects_when_bucket_is_empty(clock):
+    limiter = TokenBucketLimiter(ok_app, capacity=2, window_seconds=60, clock=clock)
+    
+    assert (await call(limiter, http_scope()))[0] == 200
+    assert (await call(limiter, http_scope()))[0] == 200
+    status, headers = await call(limiter, http_scope())
+    
+    assert status == 429
+    assert headers[b"retry-after"] == b"30"
+
+
+@pytest.mark.asyncio
+async def test_refills_over_time(clock):
+    limiter = TokenBucketLimiter(ok_app, capacity=2, window_seconds=60, clock=clock)
+    await call(limiter, http_scope())
+    await call(limiter, http_scope())
+    
+    clock.now += 29
+    assert (await call(limiter, http_scope()))[0] == 429
+    
+    clock.now += 31
+    assert (await call(limiter, http_scope()))[0] == 200
+
+
+@pytest.mark.asyncio
+async def test_buckets_are_per_client(clock):
+    limiter = TokenBucketLimiter(ok_app, capacity=1, window_seconds=60, clock=clock)
+    
+    assert (await call(limiter, http_scope(client=("10.0.0.1", 1))))[0] == 200
+    assert (await call(limiter, http_scope(client=("10.0.0.2", 1))))[0] == 200
+    assert (await call(limiter, http_scope(client=("10.0.0.1", 1))))[0] == 429
+
+
+@pytest.mark.asyncio
+async def test_exempt_paths_are_not_limited(clock):
+    limiter = TokenBucketLimiter(ok_app, capacity=1, window_seconds=60, clock=clock)
+    
+    for _ in range(3):
+        assert (await call(limiter, http_scope(path="/health/ready")))[0] == 200
+    assert limiter._buckets == {}
+
+
+@pytest.mark.asyncio
+async def test_prunes_refilled_buckets(clock):
+    limiter = TokenBucketLimiter(ok_app, capacity=2, window_seconds=60, clock=clock)
+    await call(limiter, http_scope(client=("10.0.0.1", 1)))
+    
+    clock.now += 50
+    for _ in range(2):
+        await call(limiter, http_scope(client=("10.0.0.2", 1)))
+    
+    # Next window: 10.0.0.1 has fully refilled, 10.0.0.2 has not
+    clock.now += 15
+    await call(limiter, http_scope(client=("10.0.0.3", 1)))
+    
+    assert set(limiter._buckets) == {"10.0.0.2", "10.0.0.3"}
+
+
+@pytest.mark.asyncio
+async def test_bucket_count_is_capped(clock):
+    limiter = TokenBucketLimiter(ok_app, capacity=5, window_seconds=60, max_buckets=2, clock=clock)
+    
+    for host in ("10.0.0.1", "10.0.0.2", "10.0.0.1", "10.0.0.3"):
+        await call(limiter, http_scope(client=(host, 1)))
+    
+    # Least recently seen client is evicted first
+    assert list(limiter._buckets) == ["10.0.0.1", "10.0.0.3"]
+
+
+@pytest.mark.asyncio
+async def test_spoofed_forwarded_for_shares_the_real_client_bucket(clock):
+    limiter = TokenBucketLimiter(ok_app, capacity=1, window_seconds=60, trusted_hops=1, clock=clock)
+    
+    for fake_ip in ("1.1.1.1", "2.2.2.2"):
+        headers = [(b"x-forwarded-for", f"{fake_ip}, 203.0.113.7".encode())]
+        status, _ = await call(limiter, http_scope(client=("169.254.1.1", 1), headers=headers))
+    
+    assert status == 429
+    assert list(limiter._buckets) == ["203.0.113.7"]
+
+
+def test_client_ip_from_scope():
+    headers = [(b"x-forwarded-for", b"1.1.1.1, 203.0.113.7"), (b"x-forwarded-for", b"35.191.0.1")]
+    scope = http_scope(client=("169.254.1.1", 1), headers=headers)
+    
+    assert client_ip_from_scope(scope, 0) == "169.254.1.1"
+    assert client_ip_from_scope(scope, 1) == "35.191.0.1"
+    assert client_ip_from_scope(scope, 2) == "203.0.113.7"
+    assert client_ip_from_scope(scope, 4) == "169.254.1.1"
+    assert client_ip_from_scope(http_scope(client=None), 1) == "127.0.0.1"